@@ -1,4 +1,7 @@
 import time
+import threading
+from collections import deque
+from types import SimpleNamespace
 import board
 import adafruit_dht
 import lgpio
@@ -10,57 +13,92 @@ LED_WARNING = 22    # Red LED - consecutive temperature rise warning
 
 # DHT11 temperature and humidity sensor on GPIO 4 (board.D4)
 dht = adafruit_dht.DHT11(board.D4)
+DHT_READ_INTERVAL = 2.0     # Seconds between successful DHT11 reads
+SAMPLE_INTERVAL = 5.0       # Seconds between temperature checks in the main loop
+DHT_MAX_AGE = 10.0          # Readings older than this are treated as a sensor error
+DHT_MAX_BACKOFF = 4.0       # Longest wait between retries after failed reads (well below DHT_MAX_AGE)
+
+# LED states as bitmasks for the LED group (bit 0 = NORMAL, bit 1 = ALERT, bit 2 = WARNING)
+STATE_OFF = 0b000
+STATE_NORMAL = 0b001
+STATE_ALERT = 0b010
+STATE_WARNING = 0b100
 
 # Initialize GPIO for LEDs
 h = lgpio.gpiochip_open(0)  # Open GPIO chip 0
-for pin in [LED_NORMAL, LED_ALERT, LED_WARNING]:
-    lgpio.gpio_claim_output(h, pin)  # Set pins as outputs
+lgpio.group_claim_output(h, [LED_NORMAL, LED_ALERT, LED_WARNING])  # Claim LED pins as one output group
 
-def led_on(pin):
-    """Turn on LED connected to specified pin"""
-    lgpio.gpio_write(h, pin, 1)
+def set_leds(state):
+    """Set all three LEDs at once with a single group write"""
+    lgpio.group_write(h, LED_NORMAL, state, 0b111)
 
-def led_off(pin):
-    """Turn off LED connected to specified pin"""
-    lgpio.gpio_write(h, pin, 0)
+# Latest DHT11 reading, shared with the background reader thread
+dht_state = SimpleNamespace(temperature=None, humidity=None, timestamp=0.0)
+dht_lock = threading.Lock()
+
+def dht_worker():
+    """Read the DHT11 sensor in the background so the main loop never blocks on it"""
+    fails = 0
+    while True:
+        try:
+            temperature = dht.temperature
+            humidity = dht.humidity
+        except RuntimeError as e:
+            # Handle sensor reading errors (common with DHT sensors)
+            # Retry with exponential backoff: 2s, then 4s (DHT_MAX_BACKOFF).
+            # The driver returns its cached reading when read again within 2s,
+            # so a shorter retry would not reach the sensor at all.
+            print("Error reading from sensor:", e.args[0])
+            fails += 1
+            time.sleep(min(DHT_MAX_BACKOFF, DHT_READ_INTERVAL * 2 ** (fails - 1)))
+            continue
+        
+        fails = 0
+        with dht_lock:
+            dht_state.temperature = temperature
+            dht_state.humidity = humidity
+            dht_state.timestamp = time.monotonic()
+        time.sleep(DHT_READ_INTERVAL)
 
 try:
     # Startup sequence: Turn on NORMAL LED for 1s, then blink twice and stay on
-    led_on(LED_NORMAL)
+    set_leds(STATE_NORMAL)
     time.sleep(1)
     
     # Blink sequence (2 times) to indicate system initialization
     for _ in range(2):
-        led_off(LED_NORMAL)
+        set_leds(STATE_OFF)
         time.sleep(0.3)
-        led_on(LED_NORMAL)
+        set_leds(STATE_NORMAL)
         time.sleep(0.3)
     
+    # Start reading the DHT11 sensor in the background
+    threading.Thread(target=dht_worker, daemon=True).start()
+    
     # Initialize variables for temperature monitoring
-    temps = []                      # List to store last 5 temperature readings
+    temps = deque(maxlen=5)         # Last 5 temperature readings (25 seconds of data at 5s intervals)
     consecutive_alerts = 0          # Counter for consecutive temperature rise alerts
     
-    # Main monitoring loop
+    # Main monitoring loop, scheduled on a fixed 5-second grid
+    next_sample = time.monotonic()
     while True:
-        try:
-            # Read temperature and humidity from DHT11 sensor
-            temperature = dht.temperature
-            humidity = dht.humidity
+        # Get the latest temperature and humidity read by the background thread
+        with dht_lock:
+            temperature = dht_state.temperature
+            humidity = dht_state.humidity
+            age = time.monotonic() - dht_state.timestamp
+        
+        if temperature is not None and age <= DHT_MAX_AGE:
             print(f"Temperature: {temperature}°C")
             print(f"Humidity: {humidity}%")
-        except RuntimeError as e:
-            # Handle sensor reading errors (common with DHT sensors)
-            print("Error reading from sensor:", e.args[0])
+        else:
+            # No recent reading available - treat as a sensor error
             temperature = None
         
         if temperature is not None:
-            # Add current temperature to the list
+            # Add current temperature (the oldest one is dropped automatically)
             temps.append(temperature)
             
-            # Keep only the last 5 measurements (25 seconds of data at 5s intervals)
-            if len(temps) > 5:
-                temps.pop(0)  # Remove oldest measurement
-            
             # Check for temperature rise pattern (need 5 measurements)
             if len(temps) == 5:
                 # Calculate temperature delta between newest and oldest reading
@@ -69,39 +107,36 @@ try:
                 if delta > 1:  # Temperature rose more than 1°C in 20 seconds
                     consecutive_alerts += 1
                     
-                    # Turn on ALERT LED and turn off NORMAL LED
-                    led_on(LED_ALERT)
-                    led_off(LED_NORMAL)
-                    
-                    # If 2 consecutive alerts, turn on WARNING LED and turn off ALERT LED
+                    # If 2 consecutive alerts, only the WARNING LED is on, otherwise only the ALERT LED
                     if consecutive_alerts >= 2:
-                        led_on(LED_WARNING)   # Critical warning - consecutive temperature rises
-                        led_off(LED_ALERT)    # Turn off yellow LED when red is active
+                        set_leds(STATE_WARNING)   # Critical warning - consecutive temperature rises
                     else:
-                        led_off(LED_WARNING)
+                        set_leds(STATE_ALERT)
                         
                 else:  # Temperature stable or decreasing
                     consecutive_alerts = 0  # Reset consecutive alert counter
                     
                     # Normal operation: only NORMAL LED on
-                    led_on(LED_NORMAL)
-                    led_off(LED_ALERT)
-                    led_off(LED_WARNING)
+                    set_leds(STATE_NORMAL)
                     
             else:
                 # Not enough measurements yet - show normal status
-                led_on(LED_NORMAL)
-                led_off(LED_ALERT)
-                led_off(LED_WARNING)
+                set_leds(STATE_NORMAL)
                 
         else:
             # Sensor reading error - keep NORMAL LED on to indicate standby mode
-            led_on(LED_NORMAL)
-            led_off(LED_ALERT)
-            led_off(LED_WARNING)
+            set_leds(STATE_NORMAL)
         
-        # Wait 5 seconds before next reading
-        time.sleep(5)
+        # Wait until the next reading in short steps, so the loop can react
+        # quickly and sampling does not drift by the time spent in the loop body
+        next_sample += SAMPLE_INTERVAL
+        remaining = next_sample - time.monotonic()
+        if remaining < -SAMPLE_INTERVAL:
+            # Fell more than a whole interval behind - restart the schedule from now
+            next_sample = time.monotonic()
+        while remaining > 0:
+            time.sleep(min(0.05, remaining))
+            remaining = next_sample - time.monotonic()
         
 except KeyboardInterrupt:
     # Handle Ctrl+C gracefully
@@ -109,6 +144,5 @@ except KeyboardInterrupt:
     
 finally:
     # Cleanup: turn off all LEDs and close GPIO
-    for pin in [LED_NORMAL, LED_ALERT, LED_WARNING]:
-        led_off(pin)
+    set_leds(STATE_OFF)
     lgpio.gpiochip_close(h)  # Close GPIO chip connection
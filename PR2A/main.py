@@ -1,8 +1,12 @@
 import time
+import functools
+import threading
+from types import SimpleNamespace
 import board
 import adafruit_dht
 import adafruit_ssd1306
 import lgpio
+import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 
 # Pin definitions
@@ -10,9 +14,19 @@ DHT_PIN = board.D4          # DHT11 temperature and humidity sensor
 LDR_PIN = 17               # Light sensor
 BUTTON_MODE = 23           # Single button to cycle display modes
 
+# DHT11 timing
+DHT_READ_INTERVAL = 2.0          # Seconds between successful DHT11 reads
+DHT_MAX_BACKOFF = 4.0            # Longest wait between retries after failed reads (well below DHT_MAX_AGE)
+DHT_MAX_AGE = 10_000_000_000     # Readings older than this (nanoseconds) are shown as a sensor error
+
 # OLED display dimensions
 WIDTH = 128
 HEIGHT = 64
+PAGES = HEIGHT // 8        # The SSD1306 stores pixels in 8-pixel-high pages
+
+# SSD1306 commands used for partial display updates
+SET_COL_ADDR = 0x21
+SET_PAGE_ADDR = 0x22
 
 # Initialize sensors and display
 dht = adafruit_dht.DHT11(DHT_PIN)
@@ -24,7 +38,7 @@ h = lgpio.gpiochip_open(0)
 
 # Set up GPIO pins
 lgpio.gpio_claim_input(h, LDR_PIN)
-lgpio.gpio_claim_input(h, BUTTON_MODE, lgpio.SET_PULL_UP)
+lgpio.gpio_claim_alert(h, BUTTON_MODE, lgpio.FALLING_EDGE, lgpio.SET_PULL_UP)
 
 # Display modes
 MODE_TEMP = 0
@@ -32,27 +46,105 @@ MODE_HUMIDITY = 1
 MODE_LIGHT = 2
 MODE_ALL = 3
 
+# Font used for all text
+FONT = ImageFont.load_default()
+
+@functools.lru_cache(maxsize=64)
+def render_text(text):
+    """
+    Render a string once with Pillow into a numpy bitmap (1 = pixel on), cropped to its ink.
+    
+    Returns (bitmap, x offset, y offset), where the offsets give the position of the
+    bitmap relative to the point the text is drawn at. Whole strings are cached rather
+    than single glyphs, so the result is exactly what ImageDraw.text would draw.
+    """
+    left, top, right, bottom = FONT.getbbox(text, mode="1")
+    pad = bottom  # Margin for ink outside the reported box
+    image = Image.new("1", (right + 2 * pad, bottom + 2 * pad))
+    ImageDraw.Draw(image).text((pad, pad), text, font=FONT, fill=1)
+    bbox = image.getbbox()
+    if bbox is None:  # No ink (e.g. only spaces)
+        return np.zeros((0, 0), dtype=np.uint8), 0, 0
+    return np.array(image.crop(bbox), dtype=np.uint8), bbox[0] - pad, bbox[1] - pad
+
+def blit_text(framebuf, x, y, text):
+    """Draw text by OR-ing its cached bitmap into the framebuffer at (x, y)"""
+    bitmap, offset_x, offset_y = render_text(text)
+    bitmap_height, bitmap_width = bitmap.shape
+    x, y = x + offset_x, y + offset_y
+    
+    # Clip the bitmap to the display area
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + bitmap_width, WIDTH), min(y + bitmap_height, HEIGHT)
+    if x0 < x1 and y0 < y1:
+        framebuf[y0:y1, x0:x1] |= bitmap[y0 - y:y1 - y, x0 - x:x1 - x]
+
+@functools.lru_cache(maxsize=64)
+def text_size(text):
+    """Calculate text dimensions (cached, the displayed strings rarely change)"""
+    left, top, right, bottom = FONT.getbbox(text, mode="1")
+    return right - left, bottom - top
+
 class EnvironmentalStation:
     def __init__(self):
         self.current_mode = MODE_ALL
         self.temperature = None
         self.humidity = None
         self.light_level = "Unknown"
-        self.last_button_time = 0
-        self.button_debounce = 0.3  # 300ms debounce
+        self.last_button_tick = 0
+        self.button_debounce = 300_000_000  # 300ms debounce (in nanoseconds)
+        self.mode_lock = threading.Lock()
+        
+        # Persistent drawing buffer (one byte per pixel), reused for every screen update
+        self.framebuf = np.zeros((HEIGHT, WIDTH), dtype=np.uint8)
+        self.last_render_key = None  # Values shown by the last display update
+        self.last_framebuf = None    # Framebuffer bytes last sent to the display
+        
+        # Latest DHT reading, updated by a background thread
+        self.dht_state = SimpleNamespace(temperature=None, humidity=None, timestamp=0)
+        self.dht_lock = threading.Lock()
+        threading.Thread(target=self.dht_worker, daemon=True).start()
+        
+        # Cycle display modes from a GPIO alert instead of polling the button
+        self.button_cb = lgpio.callback(h, BUTTON_MODE, lgpio.FALLING_EDGE, self.button_pressed)
         
         # Clear display
         oled.fill(0)
         oled.show()
         
+    def dht_worker(self):
+        """Read the DHT sensor in the background so the main loop never blocks on it"""
+        fails = 0
+        while True:
+            try:
+                temperature = dht.temperature
+                humidity = dht.humidity
+            except RuntimeError as e:
+                # Retry with exponential backoff: 2s, then 4s (DHT_MAX_BACKOFF)
+                # (the driver returns its cached reading when read again within 2s)
+                print(f"DHT sensor error: {e.args[0]}")
+                fails += 1
+                time.sleep(min(DHT_MAX_BACKOFF, DHT_READ_INTERVAL * 2 ** (fails - 1)))
+                continue
+            
+            fails = 0
+            with self.dht_lock:
+                self.dht_state.temperature = temperature
+                self.dht_state.humidity = humidity
+                self.dht_state.timestamp = time.monotonic_ns()
+            time.sleep(DHT_READ_INTERVAL)  # DHT11 cannot be read more than about once per second
+        
     def read_sensors(self):
         """Read all sensor values"""
-        # Read temperature and humidity
-        try:
-            self.temperature = dht.temperature
-            self.humidity = dht.humidity
-        except RuntimeError as e:
-            print(f"DHT sensor error: {e.args[0]}")
+        # Copy the latest temperature and humidity from the background reader,
+        # treating a reading that is too old as a sensor error
+        with self.dht_lock:
+            if time.monotonic_ns() - self.dht_state.timestamp <= DHT_MAX_AGE:
+                self.temperature = self.dht_state.temperature
+                self.humidity = self.dht_state.humidity
+            else:
+                self.temperature = None
+                self.humidity = None
             
         # Read light sensor
         light_reading = lgpio.gpio_read(h, LDR_PIN)
@@ -63,41 +155,30 @@ class EnvironmentalStation:
         else:
             self.light_level = "Dark"
             
-    def check_buttons(self):
-        """Check button press with debouncing"""
-        current_time = time.time()
-        
-        if current_time - self.last_button_time < self.button_debounce:
-            return
+    def button_pressed(self, chip, gpio, level, tick):
+        """Handle a button press reported by lgpio, with debouncing"""
+        with self.mode_lock:
+            if tick - self.last_button_tick < self.button_debounce:
+                return
             
-        if lgpio.gpio_read(h, BUTTON_MODE) == 0:
             # Cycle through modes: ALL -> TEMP -> HUMIDITY -> LIGHT -> ALL
             self.current_mode = (self.current_mode + 1) % 4
-            self.last_button_time = current_time
+            self.last_button_tick = tick
             
             mode_names = ["All Data", "Temperature", "Humidity", "Light"]
             print(f"{mode_names[self.current_mode]} mode selected")
             
-    def get_font_size(self, font, text):
-        """Calculate text dimensions"""
-        left, top, right, bottom = font.getbbox(text)
-        return right - left, bottom - top
-        
-    def draw_centered_text(self, draw, text, font, y_offset=0):
+    def draw_centered_text(self, text, y_offset=0):
         """Draw text centered horizontally"""
-        font_width, font_height = self.get_font_size(font, text)
+        font_width, font_height = text_size(text)
         x = (WIDTH - font_width) // 2
         y = (HEIGHT - font_height) // 2 + y_offset
-        draw.text((x, y), text, font=font, fill=255)
+        blit_text(self.framebuf, x, y, text)
         
     def display_temperature(self):
         """Display temperature screen"""
-        image = Image.new("1", (WIDTH, HEIGHT))
-        draw = ImageDraw.Draw(image)
-        font = ImageFont.load_default()
-        
         # Title
-        self.draw_centered_text(draw, "TEMPERATURE", font, -20)
+        self.draw_centered_text("TEMPERATURE", -20)
         
         # Temperature value
         if self.temperature is not None:
@@ -110,22 +191,15 @@ class EnvironmentalStation:
             else:
                 comfort = "Comfortable"
                 
-            self.draw_centered_text(draw, temp_text, font, 0)
-            self.draw_centered_text(draw, comfort, font, 15)
+            self.draw_centered_text(temp_text, 0)
+            self.draw_centered_text(comfort, 15)
         else:
-            self.draw_centered_text(draw, "Sensor Error", font, 0)
+            self.draw_centered_text("Sensor Error", 0)
             
-        oled.image(image)
-        oled.show()
-        
     def display_humidity(self):
         """Display humidity screen"""
-        image = Image.new("1", (WIDTH, HEIGHT))
-        draw = ImageDraw.Draw(image)
-        font = ImageFont.load_default()
-        
         # Title
-        self.draw_centered_text(draw, "HUMIDITY", font, -20)
+        self.draw_centered_text("HUMIDITY", -20)
         
         # Humidity value
         if self.humidity is not None:
@@ -139,25 +213,18 @@ class EnvironmentalStation:
             else:
                 level = "Optimal"
                 
-            self.draw_centered_text(draw, humidity_text, font, 0)
-            self.draw_centered_text(draw, level, font, 15)
+            self.draw_centered_text(humidity_text, 0)
+            self.draw_centered_text(level, 15)
         else:
-            self.draw_centered_text(draw, "Sensor Error", font, 0)
+            self.draw_centered_text("Sensor Error", 0)
             
-        oled.image(image)
-        oled.show()
-        
     def display_light(self):
         """Display light information screen"""
-        image = Image.new("1", (WIDTH, HEIGHT))
-        draw = ImageDraw.Draw(image)
-        font = ImageFont.load_default()
-        
         # Title
-        self.draw_centered_text(draw, "LIGHT LEVEL", font, -20)
+        self.draw_centered_text("LIGHT LEVEL", -20)
         
         # Light level
-        self.draw_centered_text(draw, self.light_level, font, 0)
+        self.draw_centered_text(self.light_level, 0)
         
         # Energy saving tip
         if "Dark" in self.light_level:
@@ -167,56 +234,89 @@ class EnvironmentalStation:
         else:
             tip = "Adequate lighting"
             
-        self.draw_centered_text(draw, tip, font, 15)
-        
-        oled.image(image)
-        oled.show()
+        self.draw_centered_text(tip, 15)
         
     def display_all_data(self):
         """Display all sensor data on one screen"""
-        image = Image.new("1", (WIDTH, HEIGHT))
-        draw = ImageDraw.Draw(image)
-        font = ImageFont.load_default()
-        
         # Title
-        draw.text((35, 2), "ENV MONITOR", font=font, fill=255)
+        blit_text(self.framebuf, 35, 2, "ENV MONITOR")
         
         # Temperature
         if self.temperature is not None:
             temp_text = f"T: {self.temperature}°C"
         else:
             temp_text = "T: Error"
-        draw.text((5, 18), temp_text, font=font, fill=255)
+        blit_text(self.framebuf, 5, 18, temp_text)
         
         # Humidity
         if self.humidity is not None:
             hum_text = f"H: {self.humidity}%"
         else:
             hum_text = "H: Error"
-        draw.text((5, 32), hum_text, font=font, fill=255)
+        blit_text(self.framebuf, 5, 32, hum_text)
         
         # Light
         light_text = f"L: {self.light_level}"
         if len(light_text) > 16:  # Truncate if too long
             light_text = light_text[:13] + "..."
-        draw.text((5, 46), light_text, font=font, fill=255)
+        blit_text(self.framebuf, 5, 46, light_text)
         
         # Instructions
-        # draw.text((5, 58), "Press button to cycle", font=font, fill=255)
-        
-        oled.image(image)
-        oled.show()
+        # blit_text(self.framebuf, 5, 58, "Press button to cycle")
         
     def update_display(self):
-        """Update display based on current mode"""
-        if self.current_mode == MODE_TEMP:
+        """Update display based on current mode, only when something changed"""
+        with self.mode_lock:
+            mode = self.current_mode
+        
+        render_key = (mode, self.temperature, self.humidity, self.light_level)
+        if render_key == self.last_render_key:
+            return
+        
+        # Clear the persistent framebuffer before drawing the new screen
+        self.framebuf.fill(0)
+        
+        if mode == MODE_TEMP:
             self.display_temperature()
-        elif self.current_mode == MODE_HUMIDITY:
+        elif mode == MODE_HUMIDITY:
             self.display_humidity()
-        elif self.current_mode == MODE_LIGHT:
+        elif mode == MODE_LIGHT:
             self.display_light()
         else:  # MODE_ALL
             self.display_all_data()
+        
+        self.show_changed_pages()
+        self.last_render_key = render_key
+        
+    def show_changed_pages(self):
+        """Send only the range of display pages that changed since the last update"""
+        # Pack each column of 8 rows into one byte (SSD1306 page layout, top pixel = bit 0)
+        framebuf = np.packbits(self.framebuf.reshape(PAGES, 8, WIDTH), axis=1, bitorder="little").tobytes()
+        oled.buffer[1:] = framebuf  # First byte is the I2C data control byte
+        
+        if self.last_framebuf is None:
+            changed = list(range(PAGES))
+        else:
+            changed = [
+                page for page in range(PAGES)
+                if framebuf[page * WIDTH:(page + 1) * WIDTH] != self.last_framebuf[page * WIDTH:(page + 1) * WIDTH]
+            ]
+        
+        if len(changed) == PAGES:
+            # Every page changed - send the whole frame
+            oled.show()
+        elif changed:
+            first, last = changed[0], changed[-1]
+            oled.write_cmd(SET_COL_ADDR)
+            oled.write_cmd(0)
+            oled.write_cmd(WIDTH - 1)
+            oled.write_cmd(SET_PAGE_ADDR)
+            oled.write_cmd(first)
+            oled.write_cmd(last)
+            with oled.i2c_device:
+                oled.i2c_device.write(b"\x40" + framebuf[first * WIDTH:(last + 1) * WIDTH])
+        
+        self.last_framebuf = framebuf
             
     def run(self):
         """Main monitoring loop"""
@@ -225,13 +325,9 @@ class EnvironmentalStation:
         print("- All Data -> Temperature -> Humidity -> Light -> All Data")
         
         # Show startup message
-        image = Image.new("1", (WIDTH, HEIGHT))
-        draw = ImageDraw.Draw(image)
-        font = ImageFont.load_default()
-        self.draw_centered_text(draw, "ENV STATION", font, -10)
-        self.draw_centered_text(draw, "Starting...", font, 10)
-        oled.image(image)
-        oled.show()
+        self.draw_centered_text("ENV STATION", -10)
+        self.draw_centered_text("Starting...", 10)
+        self.show_changed_pages()
         time.sleep(2)
         
         while True:
@@ -239,9 +335,6 @@ class EnvironmentalStation:
                 # Read all sensors
                 self.read_sensors()
                 
-                # Check for button presses
-                self.check_buttons() 
-                
                 # Update display
                 self.update_display()
                 
@@ -266,6 +359,7 @@ if __name__ == "__main__":
     finally:
         # Cleanup
         print("Cleaning up GPIO...")
+        station.button_cb.cancel()  # Stop button callback
         oled.fill(0)  # Clear display
         oled.show()
         lgpio.gpiochip_close(h)  # Close GPIO
@@ -1,4 +1,7 @@
 import time
+import threading
+from collections import deque
+from statistics import median
 import board
 import lgpio
 import neopixel_spi as neopixel
@@ -17,14 +20,20 @@ LED_BRIGHTNESS = 0.5               # LED brightness (0.0 to 1.0)
 # Motion detection parameters
 MOTION_THRESHOLD = 50.0            # Distance threshold in cm to detect motion
 LIGHT_ON_DURATION = 5.0            # How long to keep lights on after motion (seconds)
+LIGHT_ON_DURATION_NS = int(LIGHT_ON_DURATION * 1_000_000_000)
 MEASUREMENT_INTERVAL = 0.1         # Time between distance measurements (seconds)
 
 # Initialize GPIO chip
 h = lgpio.gpiochip_open(0)
 lgpio.gpio_claim_output(h, TRIGGER_PIN)    # Set trigger pin as output
-lgpio.gpio_claim_input(h, ECHO_PIN)        # Set echo pin as input
+lgpio.gpio_claim_alert(h, ECHO_PIN, lgpio.BOTH_EDGES)  # Report echo edges with kernel timestamps
 lgpio.gpio_claim_input(h, LDR_PIN)         # Set LDR pin as input
 
+# Bind frequently used functions once to avoid attribute lookups on every measurement
+gpio_read = lgpio.gpio_read
+gpio_write = lgpio.gpio_write
+monotonic_ns = time.monotonic_ns
+
 # Initialize NeoPixel LED strip
 spi = board.SPI()
 pixels = neopixel.NeoPixel_SPI(
@@ -36,8 +45,31 @@ pixels = neopixel.NeoPixel_SPI(
 )
 
 # Global variables for motion tracking
-previous_distance = None
-lights_on_until = 0  # Timestamp when lights should turn off
+distance_window = deque(maxlen=3)  # Last 3 distance readings (median filter)
+distance_ema = None                # Slow moving average used as the baseline distance
+lights_on_until = 0  # Monotonic timestamp (ns) when lights should turn off
+
+# Echo edges (timestamp_ns, level) recorded by the GPIO alert callback
+echo_edges = deque(maxlen=2)
+echo_received = threading.Event()  # Set once a full echo pulse (rise + fall) is seen
+
+def echo_callback(chip, gpio, level, timestamp):
+    """
+    Record edges on the echo pin as reported by the kernel.
+    
+    Args:
+        chip: GPIO chip number
+        gpio: GPIO pin that changed
+        level: New pin level (1 = rising edge, 0 = falling edge)
+        timestamp: Kernel timestamp of the edge in nanoseconds
+    """
+    echo_edges.append((timestamp, level))
+    
+    # A falling edge right after a rising edge completes the echo pulse
+    if level == 0 and len(echo_edges) == 2 and echo_edges[0][1] == 1:
+        echo_received.set()
+
+echo_cb = lgpio.callback(h, ECHO_PIN, lgpio.BOTH_EDGES, echo_callback)
 
 def measure_distance():
     """
@@ -47,30 +79,23 @@ def measure_distance():
         float: Distance in centimeters, or None if measurement fails
     """
     try:
+        # Forget edges from any previous measurement
+        echo_edges.clear()
+        echo_received.clear()
+        
         # Send 10-microsecond pulse to trigger pin
-        lgpio.gpio_write(h, TRIGGER_PIN, 1)
+        gpio_write(h, TRIGGER_PIN, 1)
         time.sleep(0.00001)  # 10 microseconds
-        lgpio.gpio_write(h, TRIGGER_PIN, 0)
-        
-        # Wait for echo to start (pin goes HIGH)
-        start_time = time.time()
-        timeout = start_time + 0.1  # 100ms timeout
-        
-        while lgpio.gpio_read(h, ECHO_PIN) == 0:
-            start_time = time.time()
-            if start_time > timeout:
-                return None  # Timeout occurred
+        gpio_write(h, TRIGGER_PIN, 0)
         
-        # Wait for echo to end (pin goes LOW)
-        end_time = time.time()
-        while lgpio.gpio_read(h, ECHO_PIN) == 1:
-            end_time = time.time()
-            if end_time > timeout:
-                return None  # Timeout occurred
+        # Wait for the callback to report the complete echo pulse
+        if not echo_received.wait(timeout=0.1):  # 100ms timeout
+            return None  # Timeout occurred
         
         # Calculate distance based on time of flight
-        pulse_duration = end_time - start_time
-        distance = (pulse_duration * 34300) / 2  # Speed of sound: 343 m/s
+        (start_time, _), (end_time, _) = echo_edges
+        pulse_duration = end_time - start_time  # Nanoseconds
+        distance = (pulse_duration * 34300) / 2 / 1_000_000_000  # Speed of sound: 343 m/s
         
         return distance
         
@@ -86,14 +111,15 @@ def is_dark():
         bool: True if it's dark (LDR reads 1), False if there's light (LDR reads 0)
     """
     try:
-        return lgpio.gpio_read(h, LDR_PIN) == 1
+        return gpio_read(h, LDR_PIN) == 1
     except Exception as e:
         print(f"Error reading LDR sensor: {e}")
         return False
 
 def detect_motion(current_distance):
     """
-    Detect motion by comparing current distance with previous measurement.
+    Detect motion by comparing the median of the last 3 measurements with a
+    moving-average baseline, so a single bad reading does not count as motion.
     
     Args:
         current_distance (float): Current distance measurement in cm
@@ -101,17 +127,22 @@ def detect_motion(current_distance):
     Returns:
         bool: True if motion is detected, False otherwise
     """
-    global previous_distance
+    global distance_ema
     
-    if previous_distance is None:
-        previous_distance = current_distance
+    distance_window.append(current_distance)
+    if len(distance_window) < 3:
         return False
     
-    # Calculate the change in distance
-    distance_change = abs(current_distance - previous_distance)
+    # Median of the last 3 readings filters out single glitches
+    filtered_distance = median(distance_window)
     
-    # Update previous distance for next comparison
-    previous_distance = current_distance
+    if distance_ema is None:
+        distance_ema = filtered_distance
+        return False
+    
+    # Calculate the change against the baseline, then update the baseline
+    distance_change = abs(filtered_distance - distance_ema)
+    distance_ema = 0.9 * distance_ema + 0.1 * filtered_distance
     
     # Motion detected if distance change exceeds threshold
     return distance_change > 5.0  # 5cm change threshold
@@ -123,13 +154,11 @@ def turn_on_lights():
     global lights_on_until
     
     # Set all pixels to the motion detection color
-    for i in range(NUM_PIXELS):
-        pixels[i] = LED_COLOR
-    
+    pixels.fill(LED_COLOR)
     pixels.show()
     
     # Set the time when lights should turn off
-    lights_on_until = time.time() + LIGHT_ON_DURATION
+    lights_on_until = monotonic_ns() + LIGHT_ON_DURATION_NS
     
     print("Motion detected in dark environment - Lights ON")
 
@@ -150,7 +179,7 @@ def should_lights_be_on():
     Returns:
         bool: True if lights should be on, False otherwise
     """
-    return time.time() < lights_on_until
+    return monotonic_ns() < lights_on_until
 
 def main():
     """
@@ -175,14 +204,18 @@ def main():
                 # Check if object is within motion threshold
                 object_detected = distance <= MOTION_THRESHOLD
                 
+                # Check for movement with the filtered distance (called on every
+                # measurement so the median window and baseline stay up to date)
+                motion = detect_motion(distance)
+                
                 # Check ambient light level
                 dark_environment = is_dark()
                 
                 # Print status information
-                print(f"Distance: {distance:.1f}cm | Object detected: {object_detected} | Dark: {dark_environment}")
+                print(f"Distance: {distance:.1f}cm | Object detected: {object_detected} | Motion: {motion} | Dark: {dark_environment}")
                 
-                # Turn on lights if object detected in dark environment
-                if object_detected and dark_environment:
+                # Turn on lights if a moving object is detected in dark environment
+                if object_detected and motion and dark_environment:
                     turn_on_lights()
                 
                 # Turn off lights if timer expired (mandatory after timeout)
@@ -204,8 +237,9 @@ def main():
         print("\nShutting down motion detection system...")
         
     finally:
-        # Cleanup: turn off lights and close GPIO
+        # Cleanup: turn off lights, stop echo callback and close GPIO
         turn_off_lights()
+        echo_cb.cancel()
         lgpio.gpiochip_close(h)
         print("System shutdown complete!")
 
@@ -4,109 +4,219 @@ from picamera2 import Picamera2
 from ultralytics import YOLO
 import time
 import os
+import queue
+import threading
+import torch
+
+# Model configuration
+MODEL_PATH = "model/yolov11_seg_trash.pt"       # Trained PyTorch model
+ENGINE_PATH = "model/yolov11_seg_trash.engine"  # TensorRT engine (created on first run on a GPU)
+IMG_SIZE = (480, 640)                           # Fixed inference size (height, width), same as the camera frame
 
 # Initialize the Picamera2
 picam2 = Picamera2()
-picam2.preview_configuration.main.size = (800, 600)
-picam2.preview_configuration.main.format = "RGB888"
+picam2.preview_configuration.main.size = (640, 480)  # Matches IMG_SIZE, so frames need no letterbox resize
+picam2.preview_configuration.main.format = "BGR888"  # Same pixel order the loop used to get from cvtColor
 picam2.preview_configuration.align()
 picam2.configure("preview")
 picam2.start()
 
 # Load the custom YOLO segmentation model
+# On an NVIDIA GPU (e.g. Jetson) use a TensorRT FP16 engine, exported once with a fixed input size
+# If TensorRT is not usable, fall back to the PyTorch model
 print("Loading segmentation model...")
-model = YOLO("model/yolov11_seg_trash.pt")
+model = None
+if torch.cuda.is_available():
+    try:
+        if not os.path.exists(ENGINE_PATH):
+            print("Exporting model to TensorRT (FP16), this only happens once...")
+            YOLO(MODEL_PATH).export(format="engine", half=True, imgsz=IMG_SIZE, device=0, workspace=4)
+        model = YOLO(ENGINE_PATH, task="segment")
+    except Exception as e:
+        print(f"TensorRT engine unavailable ({e}), using {MODEL_PATH}")
+if model is None:
+    model = YOLO(MODEL_PATH)
 print("✅ Model loaded successfully")
 
+# Use OpenCL (through cv2.UMat) for the mask blend when a GPU/OpenCL device is available
+USE_OPENCL = cv2.ocl.haveOpenCL()
+cv2.ocl.setUseOpenCL(USE_OPENCL)
+
 # Configure parameters
 conf_threshold = 0.01  # Confidence threshold
+EDGE_KERNEL = np.ones((3, 3), np.uint8)  # Erode/dilate kernel for the mask outlines
 colors = [(255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0), (255, 0, 255), 
           (0, 255, 255), (128, 0, 128), (255, 165, 0), (255, 192, 203), (165, 42, 42)]
 
+# Single-slot queues between the pipeline stages, so only the newest data is processed
+frame_q = queue.Queue(maxsize=1)   # Captured frames waiting for inference
+result_q = queue.Queue(maxsize=1)  # (frame, results) pairs waiting to be drawn
+stop_event = threading.Event()
+
+def put_latest(q, item):
+    """Put an item in the queue, replacing the stale item if the queue is full"""
+    try:
+        q.put_nowait(item)
+    except queue.Full:
+        try:
+            q.get_nowait()  # Drop the stale item
+        except queue.Empty:
+            pass
+        q.put_nowait(item)
+
+def capture_loop():
+    """Capture frames in the background while inference runs"""
+    try:
+        while not stop_event.is_set():
+            # Capture frame-by-frame (no color conversion needed)
+            put_latest(frame_q, picam2.capture_array())
+    except Exception as e:
+        print(f"Capture error: {e}")
+        stop_event.set()  # Stop the whole pipeline instead of waiting for frames forever
+
+def inference_loop():
+    """Run YOLO inference on the newest captured frame"""
+    try:
+        while not stop_event.is_set():
+            try:
+                frame_bgr = frame_q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            
+            # Run YOLO inference
+            results = model(frame_bgr, imgsz=IMG_SIZE, conf=conf_threshold, verbose=False)
+            put_latest(result_q, (frame_bgr, results))
+    except Exception as e:
+        print(f"Inference error: {e}")
+        stop_event.set()  # Stop the whole pipeline instead of waiting for results forever
+
 print("Starting real-time detection...")
 
+threads = [
+    threading.Thread(target=capture_loop, daemon=True),
+    threading.Thread(target=inference_loop, daemon=True),
+]
+for thread in threads:
+    thread.start()
+
 try:
-    while True:
-        # Capture frame-by-frame
-        frame = picam2.capture_array()
-        
-        # Convert from RGB to BGR for OpenCV (if necessary)
-        frame_bgr = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+    # Run until 'q' is pressed or a worker thread stops
+    while not stop_event.is_set() and all(thread.is_alive() for thread in threads):
+        # Wait for the next inference result (the main thread only draws and displays)
+        try:
+            frame_bgr, results = result_q.get(timeout=0.1)
+        except queue.Empty:
+            if cv2.waitKey(1) == ord("q"):
+                break
+            continue
         img_height, img_width = frame_bgr.shape[:2]
         
-        # Run YOLO inference
-        results = model(frame_bgr, conf=conf_threshold, verbose=False)
-        
-        # Create copy for overlay
-        overlay = frame_bgr.copy()
+        # Draw overlays directly on the captured frame (it is not needed afterwards)
+        overlay = frame_bgr
         
         # Process results following your successful method
         for result in results:
             # Check if there are masks and detections
             if result.masks is not None and len(result.masks) > 0:
                 # Get mask data, boxes and confidences
-                masks = result.masks.data.cpu().numpy()
-                boxes = result.boxes.xyxy.cpu().numpy()
-                confidences = result.boxes.conf.cpu().numpy()
-                class_indices = result.boxes.cls.cpu().numpy()
+                # Masks are thresholded on the inference device so only uint8 data is copied back
+                masks = (result.masks.data > 0.5).to(torch.uint8).cpu().numpy()
+                # Boxes are copied back in one go (columns: x1, y1, x2, y2, conf, cls)
+                data = result.boxes.data.cpu().numpy()
+                boxes = data[:, :4]
+                confidences = data[:, 4]
+                class_indices = data[:, 5].astype(np.int32)
+                
+                # Drop low-confidence detections before the per-detection loop
+                keep = confidences > conf_threshold
+                masks = masks[keep]
+                boxes = boxes[keep].astype(np.int32)
+                confidences = confidences[keep]
+                class_indices = class_indices[keep]
                 
                 print(f"Detected {len(masks)} masks")
                 
+                detections = []
+                
                 # Process each prediction
-                for i, (mask, box, conf, cls_idx) in enumerate(zip(masks, boxes, confidences, class_indices)):
-                    if conf > conf_threshold:
-                        # Resize mask to image size
-                        mask_resized = cv2.resize(mask, (img_width, img_height))
-                        
-                        # Get color for this class
-                        color = np.array(colors[int(cls_idx) % len(colors)])
-                        
-                        # Create colored mask overlay
-                        mask_indices = mask_resized > 0.5
-                        overlay[mask_indices] = overlay[mask_indices] * 0.6 + color * 0.4
-                        
-                        # Draw bounding box
-                        x1, y1, x2, y2 = box.astype(int)
-                        cv2.rectangle(overlay, (x1, y1), (x2, y2), color.tolist(), 2)
-                        
-                        # Get class name
-                        class_name = result.names[int(cls_idx)] if hasattr(result, 'names') else f"Class {int(cls_idx)}"
-                        
-                        # Add label with confidence
-                        label = f"{class_name}: {conf:.2f}"
-                        (text_width, text_height), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)
-                        
-                        # Background for text
-                        cv2.rectangle(overlay, (x1, y1-text_height-10), (x1+text_width, y1), color.tolist(), -1)
-                        cv2.putText(overlay, label, (x1, y1-5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
-                        
-                        # Optional: draw contours for better definition
-                        mask_binary = (mask_resized > 0.5).astype(np.uint8)
-                        contours, _ = cv2.findContours(mask_binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-                        cv2.drawContours(overlay, contours, -1, color.tolist(), 2)
+                for mask, box, conf, cls_idx in zip(masks, boxes, confidences, class_indices):
+                    # Get color for this class
+                    color = colors[cls_idx % len(colors)]
+                    
+                    # Masks come at the inference size, which normally equals the frame size
+                    if mask.shape != (img_height, img_width):
+                        mask = cv2.resize(mask, (img_width, img_height), interpolation=cv2.INTER_NEAREST)
+                    
+                    detections.append((box, conf, cls_idx, color, mask))
+                
+                # Create colored mask overlay: fill all masks on a copy of the region their boxes cover,
+                # then blend that region with the frame in a single pass (masks are cropped to their boxes)
+                if detections:
+                    x1, y1 = np.maximum(boxes[:, :2].min(axis=0), 0)
+                    x2, y2 = boxes[:, 2:].max(axis=0) + 1
+                    region = overlay[y1:y2, x1:x2]
+                    mask_layer = region.copy()
+                    for _, _, _, color, mask in detections:
+                        mask_layer[mask[y1:y2, x1:x2].astype(bool)] = color
+                    if USE_OPENCL:
+                        region[:] = cv2.addWeighted(cv2.UMat(region), 0.6, cv2.UMat(mask_layer), 0.4, 0).get()
+                    else:
+                        # Blend straight into the frame region (no temporary result array)
+                        cv2.addWeighted(region, 0.6, mask_layer, 0.4, 0, dst=region)
+                
+                # Draw boxes, labels and outlines on top of the blended masks
+                for box, conf, cls_idx, color, mask in detections:
+                    # Draw bounding box
+                    x1, y1, x2, y2 = box
+                    cv2.rectangle(overlay, (x1, y1), (x2, y2), color, 2)
+                    
+                    # Get class name
+                    class_name = result.names[cls_idx] if hasattr(result, 'names') else f"Class {cls_idx}"
+                    
+                    # Add label with confidence
+                    label = f"{class_name}: {conf:.2f}"
+                    (text_width, text_height), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)
+                    
+                    # Background for text
+                    cv2.rectangle(overlay, (x1, y1-text_height-10), (x1+text_width, y1), color, -1)
+                    cv2.putText(overlay, label, (x1, y1-5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+                    
+                    # Optional: draw the mask outline for better definition
+                    # (mask minus its erosion, dilated once to about 2 pixels wide)
+                    edge = cv2.dilate(mask - cv2.erode(mask, EDGE_KERNEL), EDGE_KERNEL)
+                    overlay[edge.astype(bool)] = color
             
             else:
                 # If there are detections but no masks (only bounding boxes)
                 if result.boxes is not None and len(result.boxes) > 0:
-                    boxes = result.boxes.xyxy.cpu().numpy()
-                    confidences = result.boxes.conf.cpu().numpy()
-                    class_indices = result.boxes.cls.cpu().numpy()
+                    data = result.boxes.data.cpu().numpy()
+                    boxes = data[:, :4]
+                    confidences = data[:, 4]
+                    class_indices = data[:, 5].astype(np.int32)
+                    
+                    # Drop low-confidence detections before the per-detection loop
+                    keep = confidences > conf_threshold
+                    boxes = boxes[keep].astype(np.int32)
+                    confidences = confidences[keep]
+                    class_indices = class_indices[keep]
                     
                     for box, conf, cls_idx in zip(boxes, confidences, class_indices):
-                        if conf > conf_threshold:
-                            x1, y1, x2, y2 = box.astype(int)
-                            color = colors[int(cls_idx) % len(colors)]
-                            
-                            # Draw only bounding box if no masks available
-                            cv2.rectangle(overlay, (x1, y1), (x2, y2), color, 2)
-                            
-                            class_name = result.names[int(cls_idx)] if hasattr(result, 'names') else f"Class {int(cls_idx)}"
-                            label = f"{class_name}: {conf:.2f}"
-                            cv2.putText(overlay, label, (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+                        x1, y1, x2, y2 = box
+                        color = colors[cls_idx % len(colors)]
+                        
+                        # Draw only bounding box if no masks available
+                        cv2.rectangle(overlay, (x1, y1), (x2, y2), color, 2)
+                        
+                        class_name = result.names[cls_idx] if hasattr(result, 'names') else f"Class {cls_idx}"
+                        label = f"{class_name}: {conf:.2f}"
+                        cv2.putText(overlay, label, (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
         
         # Display frame with overlays
         cv2.imshow("YOLO Segmentation", overlay)
         
+        # Exit when 'q' key is pressed
+        if cv2.waitKey(1) == ord("q"):
+            break
 
 except KeyboardInterrupt:
     print("\nInterrupted by user")
@@ -116,6 +226,9 @@ except Exception as e:
 finally:
     # Clean up resources
     print("Closing application...")
+    stop_event.set()
+    for thread in threads:
+        thread.join(timeout=1)
     picam2.stop()
     cv2.destroyAllWindows()
     print("✅ Resources freed successfully")
@@ -1,13 +1,15 @@
 import cv2
+import os
 import time
 import board
 import lgpio
 import neopixel_spi as neopixel
 import adafruit_ssd1306
-from picamera2 import Picamera2
+from picamera2 import Picamera2, MappedArray
 from ultralytics import YOLO
 from PIL import Image, ImageDraw, ImageFont
 import threading
+from collections import deque
 import numpy as np
 
 # ==================== PIN CONFIGURATION ====================
@@ -21,6 +23,11 @@ LDR_PIN = 22
 # OLED Display (I2C)
 OLED_WIDTH = 128
 OLED_HEIGHT = 64
+OLED_PAGES = OLED_HEIGHT // 8  # The SSD1306 stores pixels in 8-pixel-high pages
+
+# SSD1306 commands used for partial display updates
+SET_COL_ADDR = 0x21
+SET_PAGE_ADDR = 0x22
 
 # ==================== LED STRIP CONFIGURATION ====================
 NUM_PIXELS = 12
@@ -35,6 +42,13 @@ MEASUREMENT_INTERVAL = 0.2
 CAMERA_TIMEOUT = 15.0  # Maximum time camera stays active
 CLASSIFICATION_DELAY = 1.0  # Delay between classifications
 
+# ==================== MODEL CONFIGURATION ====================
+MODEL_PATH = "model/yolov11_garbage.pt"
+# INT8 TFLite export of the model (created on first run, much faster on the Pi CPU)
+INT8_MODEL_PATH = "model/yolov11_garbage_saved_model/yolov11_garbage_int8.tflite"
+CALIBRATION_DATA = "calib.yaml"  # Dataset with representative images for INT8 calibration
+IMG_SIZE = (480, 640)  # Inference size (height, width), same as the camera frame
+
 # ==================== CLASSIFICATION CONFIGURATION ====================
 # Mapping from YOLO model labels to our display categories
 LABEL_MAPPING = {
@@ -50,9 +64,14 @@ class WasteClassificationSystem:
         # Initialize GPIO
         self.h = lgpio.gpiochip_open(0)
         lgpio.gpio_claim_output(self.h, TRIGGER_PIN)
-        lgpio.gpio_claim_input(self.h, ECHO_PIN)
+        lgpio.gpio_claim_alert(self.h, ECHO_PIN, lgpio.BOTH_EDGES)  # Report echo edges with kernel timestamps
         lgpio.gpio_claim_input(self.h, LDR_PIN)
         
+        # Echo edges (timestamp_ns, level) recorded by the GPIO alert callback
+        self.echo_edges = deque(maxlen=2)
+        self.echo_received = threading.Event()
+        self.echo_cb = lgpio.callback(self.h, ECHO_PIN, lgpio.BOTH_EDGES, self.on_echo)
+        
         # Initialize LED strip
         spi = board.SPI()
         self.pixels = neopixel.NeoPixel_SPI(
@@ -69,6 +88,14 @@ class WasteClassificationSystem:
         self.oled.fill(0)
         self.oled.show()
         
+        # Drawing surface and font reused for every display update
+        self.font = ImageFont.load_default()
+        self.oled_image = Image.new("1", (OLED_WIDTH, OLED_HEIGHT))
+        self.oled_draw = ImageDraw.Draw(self.oled_image)
+        self.text_sizes = {}  # Cached text dimensions, keyed by text
+        self.last_framebuf = None  # Display bytes last sent to the OLED
+        self.last_render_key = None  # Values shown by the last display update
+        
         # Initialize camera and model once at startup
         self.initialize_camera_and_model()
         
@@ -89,55 +116,66 @@ class WasteClassificationSystem:
         
     def display_startup_message(self):
         """Display startup message on screen"""
-        image = Image.new("1", (OLED_WIDTH, OLED_HEIGHT))
-        draw = ImageDraw.Draw(image)
-        font = ImageFont.load_default()
+        self.clear_display_image()
         
-        self.draw_centered_text(draw, "WASTE", font, -15)
-        self.draw_centered_text(draw, "CLASSIFIER", font, 0)
-        self.draw_centered_text(draw, "Starting...", font, 15)
+        self.draw_centered_text("WASTE", -15)
+        self.draw_centered_text("CLASSIFIER", 0)
+        self.draw_centered_text("Starting...", 15)
         
-        self.oled.image(image)
-        self.oled.show()
+        self.oled.image(self.oled_image)
+        self.show_changed_pages()
         time.sleep(3)
         
-    def draw_centered_text(self, draw, text, font, y_offset=0):
+    def clear_display_image(self):
+        """Clear the reusable display image"""
+        self.oled_draw.rectangle((0, 0, OLED_WIDTH, OLED_HEIGHT), fill=0)
+        
+    def text_size(self, text):
+        """Calculate text dimensions (cached, the displayed strings rarely change)"""
+        size = self.text_sizes.get(text)
+        if size is None:
+            try:
+                left, top, right, bottom = self.font.getbbox(text)
+                size = (right - left, bottom - top)
+            except AttributeError:
+                # Fallback for older PIL versions
+                size = self.font.getsize(text)
+            self.text_sizes[text] = size
+        return size
+        
+    def draw_centered_text(self, text, y_offset=0):
         """Draw horizontally centered text"""
-        try:
-            left, top, right, bottom = font.getbbox(text)
-            font_width = right - left
-            font_height = bottom - top
-        except:
-            # Fallback for older PIL versions
-            font_width, font_height = font.getsize(text)
+        font_width, font_height = self.text_size(text)
         
         x = (OLED_WIDTH - font_width) // 2
         y = (OLED_HEIGHT - font_height) // 2 + y_offset
-        draw.text((x, y), text, font=font, fill=255)
+        self.oled_draw.text((x, y), text, font=self.font, fill=255)
+        
+    def on_echo(self, chip, gpio, level, timestamp):
+        """Record echo pin edges (kernel timestamps in nanoseconds)"""
+        self.echo_edges.append((timestamp, level))
+        
+        # A falling edge right after a rising edge completes the echo pulse
+        if level == 0 and len(self.echo_edges) == 2 and self.echo_edges[0][1] == 1:
+            self.echo_received.set()
         
     def measure_distance(self):
         """Measure distance using ultrasonic sensor"""
         try:
+            self.echo_edges.clear()
+            self.echo_received.clear()
+            
             lgpio.gpio_write(self.h, TRIGGER_PIN, 1)
             time.sleep(0.00001)
             lgpio.gpio_write(self.h, TRIGGER_PIN, 0)
             
-            start_time = time.time()
-            timeout = start_time + 0.1
-            
-            while lgpio.gpio_read(self.h, ECHO_PIN) == 0:
-                start_time = time.time()
-                if start_time > timeout:
-                    return None
+            # Wait for the callback to report the complete echo pulse
+            if not self.echo_received.wait(timeout=0.1):
+                return None
             
-            end_time = time.time()
-            while lgpio.gpio_read(self.h, ECHO_PIN) == 1:
-                end_time = time.time()
-                if end_time > timeout:
-                    return None
-            
-            pulse_duration = end_time - start_time
-            distance = (pulse_duration * 34300) / 2
+            (start_time, _), (end_time, _) = self.echo_edges
+            pulse_duration = end_time - start_time  # Nanoseconds
+            distance = (pulse_duration * 34300) / 2 / 1_000_000_000
             return distance
             
         except Exception as e:
@@ -188,6 +226,7 @@ class WasteClassificationSystem:
     
     def initialize_camera_and_model(self):
         """Initialize camera and YOLO model once at startup"""
+        self.picam2 = None
         try:
             print("Initializing camera...")
             self.picam2 = Picamera2()
@@ -202,16 +241,37 @@ class WasteClassificationSystem:
             # Wait for camera to stabilize
             time.sleep(2)
             
-            # Load YOLO model with correct path
             print("Loading YOLO model...")
-            self.model = YOLO("model/yolov11_garbage.pt")
+            self.model = self.load_model()
+            
+            # Warm up with one blank frame so the predictor and TFLite interpreter are built
+            # now, with the same arguments as every later call, instead of on the first detection
+            self.model(np.zeros(IMG_SIZE + (3,), dtype=np.uint8), imgsz=IMG_SIZE, verbose=False)
             print("Camera and YOLO model initialized successfully")
             
         except Exception as e:
             print(f"Error initializing camera/model: {e}")
+            if self.picam2 is not None:
+                self.picam2.stop()
             self.picam2 = None
             self.model = None
     
+    def load_model(self):
+        """Load the INT8 TFLite model (exported once), falling back to the PyTorch model"""
+        if not os.path.exists(INT8_MODEL_PATH) and not os.path.exists(CALIBRATION_DATA):
+            # Without calibration images the export can only fail, so do not attempt it
+            print(f"{CALIBRATION_DATA} not found, using {MODEL_PATH} (see README for INT8 export)")
+            return YOLO(MODEL_PATH)
+        
+        try:
+            if not os.path.exists(INT8_MODEL_PATH):
+                print("Exporting YOLO model to INT8 TFLite, this only happens once...")
+                YOLO(MODEL_PATH).export(format="tflite", int8=True, imgsz=IMG_SIZE, data=CALIBRATION_DATA)
+            return YOLO(INT8_MODEL_PATH, task="detect")
+        except Exception as e:
+            print(f"INT8 model unavailable ({e}), using {MODEL_PATH}")
+            return YOLO(MODEL_PATH)
+    
     def classify_waste(self):
         """Classify waste using camera"""
         if self.picam2 is None or self.model is None:
@@ -224,74 +284,14 @@ class WasteClassificationSystem:
         
         with self.camera_lock:
             try:
-                # Capture frame
-                frame = self.picam2.capture_array()
-                
-                if frame is None or frame.size == 0:
-                    return
-                
-                # Show camera window when object is detected
-                if not self.camera_window_open:
-                    cv2.namedWindow('Waste Classifier Camera', cv2.WINDOW_AUTOSIZE)
-                    self.camera_window_open = True
-                
-                # Run YOLO inference on the frame
-                results = self.model(frame, verbose=False)
-                
-                # Create a copy of the frame for annotation
-                annotated_frame = frame.copy()
-                
-                # Initialize variables to track the best detection
-                best_label_text = ""
-                best_category = ""
-                highest_conf = 0
-                
-                # Process detection results
-                for result in results:
-                    if result.boxes is not None:
-                        # Iterate through all detected boxes
-                        for box in result.boxes:
-                            # Get confidence score as percentage
-                            confidence = float(box.conf[0]) * 100
-                            
-                            # Only consider detections with confidence > 60% and higher than current best
-                            if confidence > 60 and confidence > highest_conf:
-                                cls_id = int(box.cls[0])  # Get class ID
-                                original_label = result.names[cls_id]  # Get original class name from model
-                                
-                                # Map the original label to our display category
-                                if original_label in LABEL_MAPPING:
-                                    best_category = LABEL_MAPPING[original_label]
-                                    highest_conf = confidence  # Update highest confidence
-                                    print(f"Detected: {original_label} -> Mapped to: {best_category}")  # Debug mapping
-                
-                # Format the best detection text if found
-                if best_category:
-                    best_label_text = f"{best_category} {highest_conf:.2f}%"
-                    print(best_label_text)  # Print like your example
-                    
-                    self.last_classification = best_category
-                    self.classification_confidence = highest_conf
-                else:
-                    self.last_classification = "UNIDENTIFIED"
-                    self.classification_confidence = 0
-                
-                # Display the detection text on the frame
-                if best_label_text:
-                    cv2.putText(
-                        annotated_frame,
-                        best_label_text,
-                        (30, 60),  # Position (x, y)
-                        cv2.FONT_HERSHEY_SIMPLEX,  # Font type
-                        1.5,  # Font scale
-                        (0, 0, 255),  # Color (BGR format - red)
-                        3,  # Thickness
-                        cv2.LINE_AA  # Anti-aliasing
-                    )
-                
-                # Display the frame in a window
-                cv2.imshow('Waste Classifier Camera', annotated_frame)
-                cv2.waitKey(1)  # Refresh window
+                # Capture into the camera's own buffer and work on it in place (no frame copy),
+                # the buffer is handed back to the camera once the frame is processed
+                request = self.picam2.capture_request()
+                try:
+                    with MappedArray(request, "main") as mapped:
+                        self.process_frame(mapped.array)
+                finally:
+                    request.release()
                 
                 self.last_classification_time = current_time
                         
@@ -300,12 +300,91 @@ class WasteClassificationSystem:
                 self.last_classification = "CAMERA ERROR"
                 self.classification_confidence = 0
     
+    def process_frame(self, frame):
+        """Run the classifier on a captured frame and show the annotated result"""
+        if frame is None or frame.size == 0:
+            return
+        
+        # Show camera window when object is detected
+        if not self.camera_window_open:
+            cv2.namedWindow('Waste Classifier Camera', cv2.WINDOW_AUTOSIZE)
+            self.camera_window_open = True
+        
+        # Run YOLO inference on the frame
+        results = self.model(frame, imgsz=IMG_SIZE, verbose=False)
+        
+        # Annotate the captured frame directly (it is not needed afterwards)
+        annotated_frame = frame
+        
+        # Initialize variables to track the best detection
+        best_label_text = ""
+        best_category = ""
+        highest_conf = 0
+        
+        # Process detection results
+        for result in results:
+            if result.boxes is not None:
+                # Copy all boxes back in one go (columns: x1, y1, x2, y2, conf, cls)
+                data = result.boxes.data.cpu().numpy()
+                confidences = data[:, 4] * 100  # Confidence scores as percentages
+                class_indices = data[:, 5].astype(np.int32)
+                
+                # Only consider detections with confidence > 60%
+                keep = confidences > 60
+                
+                # Iterate through the remaining boxes
+                for confidence, cls_id in zip(confidences[keep], class_indices[keep]):
+                    # Only consider detections with higher confidence than current best
+                    if confidence > highest_conf:
+                        original_label = result.names[cls_id]  # Get original class name from model
+                        
+                        # Map the original label to our display category
+                        if original_label in LABEL_MAPPING:
+                            best_category = LABEL_MAPPING[original_label]
+                            highest_conf = float(confidence)  # Update highest confidence
+                            print(f"Detected: {original_label} -> Mapped to: {best_category}")  # Debug mapping
+        
+        # Format the best detection text if found
+        if best_category:
+            best_label_text = f"{best_category} {highest_conf:.2f}%"
+            print(best_label_text)  # Print like your example
+            
+            self.last_classification = best_category
+            self.classification_confidence = highest_conf
+        else:
+            self.last_classification = "UNIDENTIFIED"
+            self.classification_confidence = 0
+        
+        # Display the detection text on the frame
+        if best_label_text:
+            cv2.putText(
+                annotated_frame,
+                best_label_text,
+                (30, 60),  # Position (x, y)
+                cv2.FONT_HERSHEY_SIMPLEX,  # Font type
+                1.5,  # Font scale
+                (0, 0, 255),  # Color (BGR format - red)
+                3,  # Thickness
+                cv2.LINE_AA  # Anti-aliasing
+            )
+        
+        # Display the frame in a window
+        cv2.imshow('Waste Classifier Camera', annotated_frame)
+        cv2.waitKey(1)  # Refresh window
+    
     def update_display(self):
-        """Update OLED display with current information"""
+        """Update OLED display with current information, only when something changed"""
         try:
-            image = Image.new("1", (OLED_WIDTH, OLED_HEIGHT))
-            draw = ImageDraw.Draw(image)
-            font = ImageFont.load_default()
+            camera_active = time.time() < self.camera_active_until
+            lights_on = self.should_lights_be_on()
+            render_key = (self.last_classification, self.classification_confidence, camera_active, lights_on)
+            if render_key == self.last_render_key:
+                return
+            
+            # Clear and redraw the reusable image
+            self.clear_display_image()
+            draw = self.oled_draw
+            font = self.font
             
             # Title
             draw.text((30, 2), "CLASSIFIER", font=font, fill=255)
@@ -315,27 +394,55 @@ class WasteClassificationSystem:
                 draw.text((5, 18), f"Type: {self.last_classification}", font=font, fill=255)
                 draw.text((5, 32), f"Conf: {self.classification_confidence:.1f}%", font=font, fill=255)
             else:
-                self.draw_centered_text(draw, self.last_classification, font, 5)
+                self.draw_centered_text(self.last_classification, 5)
             
             # System status
-            current_time = time.time()
-            if current_time < self.camera_active_until:
+            if camera_active:
                 draw.text((5, 46), "CAM: ACTIVE", font=font, fill=255)
             else:
                 draw.text((5, 46), "CAM: IDLE", font=font, fill=255)
             
             # Light indicator
-            if self.should_lights_be_on():
+            if lights_on:
                 draw.text((85, 46), "LED: ON", font=font, fill=255)
             else:
                 draw.text((85, 46), "LED: OFF", font=font, fill=255)
             
-            self.oled.image(image)
-            self.oled.show()
+            self.oled.image(self.oled_image)
+            self.show_changed_pages()
+            self.last_render_key = render_key
             
         except Exception as e:
             print(f"Display update error: {e}")
     
+    def show_changed_pages(self):
+        """Send only the range of display pages that changed since the last update"""
+        framebuf = bytes(self.oled.buffer[1:])  # First byte is the I2C data control byte
+        
+        if self.last_framebuf is None:
+            changed = list(range(OLED_PAGES))
+        else:
+            changed = [
+                page for page in range(OLED_PAGES)
+                if framebuf[page * OLED_WIDTH:(page + 1) * OLED_WIDTH] != self.last_framebuf[page * OLED_WIDTH:(page + 1) * OLED_WIDTH]
+            ]
+        
+        if len(changed) == OLED_PAGES:
+            # Every page changed - send the whole frame
+            self.oled.show()
+        elif changed:
+            first, last = changed[0], changed[-1]
+            self.oled.write_cmd(SET_COL_ADDR)
+            self.oled.write_cmd(0)
+            self.oled.write_cmd(OLED_WIDTH - 1)
+            self.oled.write_cmd(SET_PAGE_ADDR)
+            self.oled.write_cmd(first)
+            self.oled.write_cmd(last)
+            with self.oled.i2c_device:
+                self.oled.i2c_device.write(b"\x40" + framebuf[first * OLED_WIDTH:(last + 1) * OLED_WIDTH])
+        
+        self.last_framebuf = framebuf
+    
     def sensor_monitoring_loop(self):
         """Main sensor monitoring loop"""
         print("Waste classification system started")
@@ -435,7 +542,8 @@ class WasteClassificationSystem:
             pass
         
         try:
-            # Close GPIO
+            # Stop echo callback and close GPIO
+            self.echo_cb.cancel()
             lgpio.gpiochip_close(self.h)
         except:
             pass